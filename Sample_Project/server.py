@@ -1,10 +1,25 @@
 import os
+from pathlib import Path
 from flask import Flask, send_from_directory, jsonify, request
 from flask_cors import CORS
 
 app = Flask(__name__, static_folder='frontend/dist')
 CORS(app)
 
+# Resolved once at startup instead of re-joining paths on every request.
+DIST_DIR = Path(os.getcwd()) / 'frontend' / 'dist'
+INDEX_PATH = DIST_DIR / 'index.html'
+_index_found = False
+# Vite fingerprints files under assets/, so browsers may cache them for a year.
+ASSET_MAX_AGE = 31536000
+
+def index_exists():
+    # Only a positive answer is cached, so a build made after startup is still picked up.
+    global _index_found
+    if not _index_found:
+        _index_found = INDEX_PATH.is_file()
+    return _index_found
+
 @app.route('/api/data', methods=['GET'])
 def api_data():
     sample = {'message': 'Hello from Flask backend', 'ok': True}
@@ -28,15 +43,16 @@ def api_proxy(subpath):
 @app.route('/<path:path>')
 def serve_frontend(path):
     # Serve static files from frontend/dist when available; otherwise informative message
-    dist_dir = os.path.join(os.getcwd(), 'frontend', 'dist')
-    
-    if path != '' and os.path.exists(os.path.join(dist_dir, path)):
-        return send_from_directory(dist_dir, path)
-    index_path = os.path.join(dist_dir, 'index.html')
-    if os.path.exists(index_path):
-        return send_from_directory(dist_dir, 'index.html')
+    if path and (DIST_DIR / path).is_file():
+        max_age = ASSET_MAX_AGE if path.startswith('assets/') else None
+        return send_from_directory(DIST_DIR, path, max_age=max_age)
+    if index_exists():
+        return send_from_directory(DIST_DIR, 'index.html')
     return jsonify({'message': 'Frontend build not found. Run `cd frontend && npm install && npm run build`.'}), 200
 
 if __name__ == '__main__':
+    # Development server only. In production run a WSGI server instead, e.g.
+    #   gunicorn -w $(nproc) -k gthread --threads 4 server:app
     # Use 0.0.0.0 for easier local testing in containers/VMs if needed
-    app.run(host='0.0.0.0', port=int(os.environ.get('PORT', 5000)), debug=True)
+    debug = os.environ.get('FLASK_ENV') == 'development'
+    app.run(host='0.0.0.0', port=int(os.environ.get('PORT', 5000)), debug=debug)
@@ -1,35 +1,392 @@
 import os
+import re
 import asyncio
-import json
+import collections
+import contextlib
+import functools
+import logging
+import mmap
 import time
+from dataclasses import dataclass
+from typing import Optional
 from urllib.parse import urlparse, urljoin
-import requests
-from bs4 import BeautifulSoup
+import urllib3
+from lxml import etree
 from playwright.async_api import async_playwright
 from tqdm import tqdm
+from serialization import dump_file
+from extractor import extract_components_from_tree, parse_lexbor, parse_lxml, prefer_lexbor
 
-def allowed_by_robots(url):
-    parsed = urlparse(url)
-    robots_url = f"{parsed.scheme}://{parsed.netloc}/robots.txt"
+log = logging.getLogger(__name__)
+
+# One pooled client for robots.txt and HEAD lookups so repeat hosts reuse their TCP/TLS connection.
+_HTTP = urllib3.PoolManager(maxsize=10)
+
+
+@functools.lru_cache(maxsize=256)
+def _robots_allows(scheme, netloc):
+    # Raises when there is no real answer (network error, 5xx) so lru_cache doesn't keep it.
+    robots_url = f"{scheme}://{netloc}/robots.txt"
+    r = _HTTP.request("GET", robots_url, timeout=5, preload_content=False)
     try:
-        r = requests.get(robots_url, timeout=5)
-        if r.status_code != 200:
+        if r.status >= 500:
+            raise urllib3.exceptions.HTTPError(f"{robots_url} returned HTTP {r.status}")
+        if r.status != 200:
             return True
-        txt = r.text.lower()
-       
-        if "disallow: /" in txt:
-            return False
+        # Scan line by line as the body streams in and bail out on the first hit,
+        # rather than buffering the whole file and lowercasing a copy of it.
+        for line in r:
+            if b"disallow: /" in line.lower():
+                return False
         return True
+    finally:
+        r.drain_conn()
+        r.release_conn()
+
+
+def allowed_by_robots(url):
+    # Answers are cached per scheme+host, so only the first page of a site pays the round-trip.
+    # A failed lookup allows the crawl but isn't cached; the next call asks again.
+    parsed = urlparse(url)
+    try:
+        return _robots_allows(parsed.scheme, parsed.netloc)
     except Exception:
         return True
 
 
+def head_etag(url, if_none_match=None):
+    """
+    HEAD url and return (status, etag). With if_none_match, a 304 status means the
+    page still matches that ETag. Returns (None, None) if the request fails.
+    """
+    headers = {"If-None-Match": if_none_match} if if_none_match else None
+    try:
+        r = _HTTP.request("HEAD", url, headers=headers, timeout=5)
+    except Exception:
+        return None, None
+    return r.status, r.headers.get("ETag")
+
+
 PROPRIETARY_MARKERS = ["instagram.com", "facebook.com", "whatsapp.com", "uber.com", "airbnb.com", "tiktok.com", "twitter.com", "x.com", "snapchat.com"]
+_PROPRIETARY_RE = re.compile("|".join(map(re.escape, PROPRIETARY_MARKERS)))
 def likely_proprietary_domain(url):
     p = urlparse(url).netloc.lower()
-    return any(k in p for k in PROPRIETARY_MARKERS)
+    return _PROPRIETARY_RE.search(p) is not None
+
+
+SNIPPET_CHARS = 2000
+_NON_TEXT_TAGS = ("script", "style")
+
+
+_WORD = re.compile(r"\S+")
+
+
+def _bounded_snippet(strings, limit=SNIPPET_CHARS):
+    # Whitespace-normalized join of `strings`, but stop pulling text once `limit`
+    # characters are in hand instead of materializing the whole page's text.
+    # Words are scanned lazily, so one huge text node isn't split in full either.
+    words = []
+    size = 0
+    for text in strings:
+        for m in _WORD.finditer(text):
+            word = m.group()
+            words.append(word)
+            size += len(word) + 1
+            if size > limit:
+                return " ".join(words)[:limit]
+    return " ".join(words)
+
+
+def _lxml_strings(tree):
+    # Document-order text: an element's .text at its start, its .tail after its subtree.
+    for event, el in etree.iterwalk(tree, events=("start", "end")):
+        if event == "start":
+            if el.text and isinstance(el.tag, str) and el.tag not in _NON_TEXT_TAGS:
+                yield el.text
+        elif el.tail and el is not tree:
+            yield el.tail
+
+
+def _lexbor_strings(root):
+    for node in root.traverse(include_text=True):
+        if node.tag == "-text" and node.text_content:
+            yield node.text_content
+
+
+def parse_html(content):
+    """Parse page HTML with lxml; returns None for empty/unparseable documents."""
+    return parse_lxml(content)
+
+
+def _same_origin_link(url, href, start_netloc):
+    href = (href or "").strip()
+    if href.startswith("javascript:") or href.startswith("#"):
+        return None
+    joined = urljoin(url, href)
+    
+    if urlparse(joined).netloc != start_netloc:
+        return None
+    return joined.partition('#')[0]
+
+
+def _harvest_lxml(tree, url, start_netloc):
+    links = set()
+    if tree is None:
+        return links, ""
+    for el, attr, href, _ in tree.iterlinks():
+        if el.tag == "a" and attr == "href":
+            link = _same_origin_link(url, href, start_netloc)
+            if link:
+                links.add(link)
+    return links, _bounded_snippet(_lxml_strings(tree))
+
+
+def _harvest_lexbor(tree, url, start_netloc):
+    # Strips script/style from `tree` for the snippet, so run any other pass on it first.
+    links = set()
+    for a in tree.css("a[href]"):
+        link = _same_origin_link(url, a.attributes.get("href"), start_netloc)
+        if link:
+            links.add(link)
+    if tree.root is None:
+        return links, ""
+    tree.strip_tags(list(_NON_TEXT_TAGS))
+    return links, _bounded_snippet(_lexbor_strings(tree.root))
+
+
+def harvest_links_and_text(content, url, start_netloc):
+    """Return (same-origin links, text snippet) for a crawled page."""
+    if prefer_lexbor():
+        return _harvest_lexbor(parse_lexbor(content), url, start_netloc)
+    return _harvest_lxml(parse_html(content), url, start_netloc)
+
+CRAWL_WORKERS = 4
+WRITE_BATCH_SIZE = 16
+BROWSER_POOL_SIZE = int(os.environ.get("BROWSER_POOL_SIZE", "4"))
+BROWSER_POOL_RECYCLE_AFTER = int(os.environ.get("BROWSER_POOL_RECYCLE_AFTER", "100"))
+
+
+class BrowserPool:
+    """
+    Keeps up to `size` headless Chromium instances alive between crawls and hands
+    out one fresh context per checkout. Browsers are launched on first demand and
+    relaunched after serving `recycle_after` contexts to cap their memory growth.
+    Playwright objects belong to the event loop that made them, so create, use and
+    close() a pool on one loop.
+    """
+
+    def __init__(self, size=BROWSER_POOL_SIZE, recycle_after=BROWSER_POOL_RECYCLE_AFTER):
+        self.size = max(1, size)
+        self.recycle_after = recycle_after
+        self._playwright = None
+        self._idle = collections.deque()
+        self._served = {}
+        self._launched = 0
+        self._lock = asyncio.Lock()
+        # Signalled whenever a browser goes idle or a launch slot frees up (recycle, failure).
+        self._available = asyncio.Condition()
+
+    async def _launch(self):
+        async with self._lock:
+            if self._playwright is None:
+                self._playwright = await async_playwright().start()
+        browser = await self._playwright.chromium.launch(headless=True)
+        self._served[browser] = 0
+        return browser
+
+    async def _notify(self):
+        async with self._available:
+            self._available.notify()
+
+    async def _checkout(self):
+        async with self._available:
+            while not self._idle and self._launched >= self.size:
+                await self._available.wait()
+            if self._idle:
+                return self._idle.popleft()
+            # Count the slot before awaiting the launch so concurrent callers don't overshoot.
+            self._launched += 1
+        try:
+            return await self._launch()
+        except Exception:
+            self._launched -= 1
+            await self._notify()
+            raise
+
+    @contextlib.asynccontextmanager
+    async def acquire_context(self):
+        browser = await self._checkout()
+        try:
+            context = await browser.new_context()
+        except Exception:
+            await self._retire(browser)
+            raise
+        self._served[browser] += 1
+        try:
+            yield context
+        finally:
+            await self.release_context(context)
+
+    async def release_context(self, context):
+        browser = context.browser
+        try:
+            await context.close()
+        except Exception:
+            pass
+        if self._served.get(browser, 0) >= self.recycle_after:
+            # Frees the slot; the next caller in line launches the fresh replacement.
+            await self._retire(browser)
+        else:
+            self._idle.append(browser)
+            await self._notify()
+
+    async def _retire(self, browser):
+        if self._served.pop(browser, None) is not None:
+            self._launched -= 1
+            await self._notify()
+        try:
+            await browser.close()
+        except Exception:
+            pass
+
+    async def close(self):
+        while self._idle:
+            await self._retire(self._idle.popleft())
+        if self._playwright is not None:
+            await self._playwright.stop()
+            self._playwright = None
+
 
-async def crawl(start_url, max_pages=30, max_depth=2, out_dir="crawl_output"):
+# Opt-in (CRAWLER_O_DIRECT=1, Linux): write HTML dumps with O_DIRECT so large pages
+# go straight to the device instead of filling the page cache with data we never reread.
+USE_O_DIRECT = os.environ.get("CRAWLER_O_DIRECT") == "1" and hasattr(os, "O_DIRECT")
+
+
+def _write_direct(path, blob):
+    size = len(blob)
+    # O_DIRECT needs aligned buffers and lengths; anonymous mmaps are page-aligned.
+    padded = max(mmap.PAGESIZE, -(-size // mmap.PAGESIZE) * mmap.PAGESIZE)
+    buf = mmap.mmap(-1, padded)
+    try:
+        buf.write(blob)
+        fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC | os.O_DIRECT, 0o644)
+        try:
+            with memoryview(buf) as view:
+                written = 0
+                while written < padded:
+                    written += os.write(fd, view[written:])
+            os.ftruncate(fd, size)
+        finally:
+            os.close(fd)
+    finally:
+        buf.close()
+
+
+def _write_batch(batch):
+    for path, content in batch:
+        if USE_O_DIRECT:
+            try:
+                _write_direct(path, content.encode("utf-8"))
+                continue
+            except Exception:
+                # e.g. tmpfs and some overlay filesystems reject O_DIRECT, or the text doesn't
+                # encode (lone surrogates); the normal write below copes or skips the file.
+                pass
+        try:
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(content)
+        except Exception:
+            pass
+
+
+async def _artifact_writer(write_queue):
+    # Drain whatever is queued (up to WRITE_BATCH_SIZE) and write it in one thread hop,
+    # so multi-MB HTML dumps never block the event loop the page workers share.
+    while True:
+        batch = [await write_queue.get()]
+        while len(batch) < WRITE_BATCH_SIZE and not write_queue.empty():
+            batch.append(write_queue.get_nowait())
+        try:
+            await asyncio.to_thread(_write_batch, batch)
+        except Exception as e:
+            # Keep draining: if this task died, crawl() would wait on write_queue.join() forever.
+            log.warning("Failed to write %d crawl artifact(s): %s", len(batch), e)
+        finally:
+            for _ in batch:
+                write_queue.task_done()
+
+
+@dataclass(slots=True)
+class CrawlPage:
+    """One crawled page; crawl() returns {url: CrawlPage}. Slots keep large crawls lean."""
+    url: str
+    screenshot: Optional[str]  # None if the screenshot failed
+    html: str
+    text_snippet: str
+    links: list
+    ux: Optional[dict] = None  # None unless crawl(extract_ux=True)
+    loaded: bool = True  # False if navigation failed and the record describes a blank tab
+
+
+async def _fetch_page(page, url, start_netloc, out_dir, write_queue, extract_ux):
+    loaded = False
+    try:
+        await page.goto(url, timeout=30000)
+        loaded = True
+        await page.wait_for_load_state('networkidle', timeout=10000)
+    except Exception:
+        pass
+
+    try:
+        content = await page.content()
+    except Exception:
+        content = ""
+    timestamp = int(time.time())
+
+    
+    parsed = urlparse(url)
+    safe_name = parsed.netloc + parsed.path.replace('/', '_') or "root"
+    screenshot_path = os.path.join(out_dir, f"{safe_name[:120]}_{timestamp}.png")
+    html_path = os.path.join(out_dir, f"{safe_name[:120]}_{timestamp}.html")
+    # The browser renders and encodes the screenshot while we parse the HTML below.
+    # The same tab navigates next, so it is awaited before this page is done.
+    screenshot_task = asyncio.create_task(page.screenshot(path=screenshot_path, full_page=True))
+    await asyncio.sleep(0)
+    write_queue.put_nowait((html_path, content))
+
+    
+    ux = None
+    if extract_ux:
+        # One tree feeds links, snippet and the UX components, so the extractor
+        # doesn't have to re-read and re-parse this page later.
+        if prefer_lexbor():
+            tree = parse_lexbor(content)
+            ux = extract_components_from_tree(tree, url=url)
+            links, text_snippet = _harvest_lexbor(tree, url, start_netloc)
+        else:
+            tree = parse_html(content)
+            links, text_snippet = _harvest_lxml(tree, url, start_netloc)
+            ux = extract_components_from_tree(tree, url=url)
+    else:
+        links, text_snippet = harvest_links_and_text(content, url, start_netloc)
+
+    try:
+        await screenshot_task
+    except Exception:
+        pass
+
+    return CrawlPage(
+        url=url,
+        screenshot=os.path.abspath(screenshot_path) if os.path.exists(screenshot_path) else None,
+        html=os.path.abspath(html_path),
+        text_snippet=text_snippet,
+        links=list(links),
+        ux=ux,
+        loaded=loaded and bool(content.strip()),
+    )
+
+
+async def crawl(start_url, max_pages=30, max_depth=2, out_dir="crawl_output", workers=CRAWL_WORKERS, pool=None, extract_ux=True):
     os.makedirs(out_dir, exist_ok=True)
     #if not allowed_by_robots(start_url):
     #   raise RuntimeError("Crawling disallowed by robots.txt for this site.")
@@ -37,76 +394,59 @@ async def crawl(start_url, max_pages=30, max_depth=2, out_dir="crawl_output"):
     if likely_proprietary_domain(start_url):
         raise RuntimeError("Target domain appears to be a large proprietary app. Aborting (policy).")
 
-    visited = set()
-    queue = [(start_url, 0)]
+    # Every URL ever queued; capping this at max_pages bounds the total work.
+    start_netloc = urlparse(start_url).netloc
+    scheduled = {start_url}
+    queue = asyncio.Queue()
+    queue.put_nowait((start_url, 0))
+    write_queue = asyncio.Queue()
     results = {}
+    start_error = None
 
-    async with async_playwright() as p:
-        browser = await p.chromium.launch(headless=True)
-        context = await browser.new_context()
-        page = await context.new_page()
-
-        while queue and len(visited) < max_pages:
-            url, depth = queue.pop(0)
-            if url in visited or depth > max_depth:
-                continue
+    async def worker(page):
+        nonlocal start_error
+        while True:
+            url, depth = await queue.get()
             try:
-                await page.goto(url, timeout=30000)
-                await page.wait_for_load_state('networkidle', timeout=10000)
-            except Exception:
-                pass
+                results[url] = record = await _fetch_page(page, url, start_netloc, out_dir, write_queue, extract_ux)
+                if depth >= max_depth:
+                    continue
+                for l in record.links:
+                    if l not in scheduled and len(scheduled) < max_pages:
+                        scheduled.add(l)
+                        queue.put_nowait((l, depth + 1))
+            except Exception as e:
+                # One bad page shouldn't stop the crawl, but it shouldn't vanish either.
+                log.warning("Failed to crawl %s: %s", url, e, exc_info=log.isEnabledFor(logging.DEBUG))
+                if url == start_url:
+                    start_error = e
+            finally:
+                queue.task_done()
 
-            try:
-                content = await page.content()
-            except Exception:
-                content = ""
-            timestamp = int(time.time())
-
-            
-            parsed = urlparse(url)
-            safe_name = parsed.netloc + parsed.path.replace('/', '_') or "root"
-            screenshot_path = os.path.join(out_dir, f"{safe_name[:120]}_{timestamp}.png")
-            html_path = os.path.join(out_dir, f"{safe_name[:120]}_{timestamp}.html")
-            try:
-                await page.screenshot(path=screenshot_path, full_page=True)
-            except Exception:
-                pass
-            try:
-                with open(html_path, "w", encoding="utf-8") as f:
-                    f.write(content)
-            except Exception:
-                pass
+    # Without a pool, this crawl gets its own and closes it before returning; pass one to
+    # share its browsers across crawls on the same event loop (the caller then closes it).
+    owned = pool is None
+    if owned:
+        pool = BrowserPool()
+    try:
+        async with pool.acquire_context() as context:
+            # Each worker drives its own tab so page loads overlap instead of serializing.
+            pages = [await context.new_page() for _ in range(max(1, min(workers, max_pages)))]
+            tasks = [asyncio.create_task(worker(page)) for page in pages]
+            tasks.append(asyncio.create_task(_artifact_writer(write_queue)))
 
-            
-            soup = BeautifulSoup(content, "html.parser")
-            links = set()
-            for a in soup.find_all("a", href=True):
-                href = a['href']
-                if href.startswith("javascript:") or href.startswith("#"):
-                    continue
-                joined = urljoin(url, href)
-                
-                if urlparse(joined).netloc == urlparse(start_url).netloc:
-                    links.add(joined.split('#')[0])
-
-            results[url] = {
-                "url": url,
-                "screenshot": os.path.abspath(screenshot_path) if os.path.exists(screenshot_path) else None,
-                "html": os.path.abspath(html_path),
-                "text_snippet": soup.get_text(separator=" ", strip=True)[:2000],
-                "links": list(links),
-            }
-
-            visited.add(url)
-            
-            for l in links:
-                if l not in visited and len(visited) + len(queue) < max_pages:
-                    queue.append((l, depth + 1))
-
-        await browser.close()
+            await queue.join()
+            await write_queue.join()
+            for t in tasks:
+                t.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+    finally:
+        if owned:
+            await pool.close()
+    if start_url not in results:
+        raise RuntimeError(f"Start URL could not be crawled: {start_error}") from start_error
     return results
 
-
 if __name__ == "__main__":
     import argparse, asyncio
     parser = argparse.ArgumentParser()
@@ -114,8 +454,10 @@ if __name__ == "__main__":
     parser.add_argument("--out", default="crawl_output")
     parser.add_argument("--max_pages", type=int, default=20)
     parser.add_argument("--max_depth", type=int, default=2)
+    parser.add_argument("--workers", type=int, default=CRAWL_WORKERS)
+    parser.add_argument("--skip_ux", action="store_true", help="Only harvest links; leave component extraction to extractor.py")
     args = parser.parse_args()
-    res = asyncio.run(crawl(args.url, max_pages=args.max_pages, max_depth=args.max_depth, out_dir=args.out))
-    with open(os.path.join(args.out, "crawl_index.json"), "w", encoding="utf-8") as f:
-        json.dump(res, f, indent=2)
+
+    res = asyncio.run(crawl(args.url, max_pages=args.max_pages, max_depth=args.max_depth, out_dir=args.out, workers=args.workers, extract_ux=not args.skip_ux))
+    dump_file(res, os.path.join(args.out, "crawl_index.json"))
     print("Crawl complete. Output in", args.out)
@@ -1,124 +1,306 @@
-import json
-from bs4 import BeautifulSoup
+import os
+import functools
+from collections import namedtuple
+import lxml.html
+from lxml import etree
+from concurrent.futures import ProcessPoolExecutor
 from urllib.parse import urlparse
+from serialization import dump_file, load_artifact
 
-def extract_components_from_html(html_content, url=None):
-    soup = BeautifulSoup(html_content, "html.parser")
-    comps = {"url": url, "title": soup.title.string if soup.title else "", "components": []}
+# selectolax's lexbor parser is optional and parses several times faster than lxml.
+# CRAWLER_HTML_PARSER=lxml forces lxml for markup lexbor mishandles.
+try:
+    from selectolax.lexbor import LexborHTMLParser
+    _SELECTOLAX_AVAILABLE = True
+except Exception:
+    _SELECTOLAX_AVAILABLE = False
 
-    
-    for b in soup.find_all(["button", "a", "input"]):
-        tag = b.name
-        text = (b.get_text() or b.get('value') or b.get('aria-label') or "").strip()
-        role = "link" if tag == "a" else "button" if tag == "button" else "input"
-        
-        itype = b.get('type') or ""
-        comps["components"].append({
-            "type": "clickable",
-            "tag": tag,
-            "role": role,
-            "input_type": itype,
-            "text": text[:200],
-            "id": b.get('id'),
-            "classes": b.get('class') or []
-        })
+HEADING_TAGS = ("h1", "h2", "h3", "h4")
 
-    
-    for form in soup.find_all("form"):
-        fields = []
-        for inp in form.find_all(["input", "textarea", "select"]):
-            fields.append({
-                "name": inp.get('name'),
-                "type": inp.get('type') or inp.name,
-                "placeholder": inp.get('placeholder') or "",
-                "required": bool(inp.get('required')),
-            })
-        comps["components"].append({
-            "type": "form",
-            "id": form.get('id'),
-            "action": form.get('action'),
-            "method": form.get('method') or "get",
-            "fields": fields
-        })
 
-   
-    navs = soup.find_all("nav")
-    for nav in navs:
-        links = [a.get_text(strip=True) for a in nav.find_all("a", href=True)]
-        comps["components"].append({
-            "type": "nav",
-            "links": links[:30]
-        })
+def prefer_lexbor():
+    """True when pages should be parsed with lexbor: selectolax is installed and CRAWLER_HTML_PARSER isn't lxml."""
+    return _SELECTOLAX_AVAILABLE and os.environ.get("CRAWLER_HTML_PARSER", "lexbor") != "lxml"
 
-    
-    for ul in soup.find_all(["ul", "ol"]):
-        items = [li.get_text(strip=True) for li in ul.find_all("li")]
-        comps["components"].append({
-            "type": "list",
-            "num_items": len(items),
-            "sample_items": items[:10]
-        })
 
+@functools.lru_cache(maxsize=None)
+def _css(tags):
+    return ", ".join(tags)
+
+
+# Handlers only touch elements through one of these, so the same code runs on lxml and lexbor trees.
+# find(el, tags) yields el and its descendants with those tags, in document order.
+_Backend = namedtuple("_Backend", "find attrs text stripped_text")
+
+_LXML = _Backend(
+    find=lambda el, tags: el.iter(*tags),
+    attrs=lambda el: el.attrib,
+    text=lambda el: el.text_content(),
+    # Same shape as BeautifulSoup's get_text(strip=True): strip every text node, join with "".
+    stripped_text=lambda el: "".join(t.strip() for t in el.itertext()),
+)
+
+_LEXBOR = _Backend(
+    find=lambda el, tags: el.css(_css(tags)),
+    # lexbor gives None for a valueless attribute (<a href>); lxml gives "".
+    attrs=lambda el: {k: "" if v is None else v for k, v in el.attributes.items()},
+    text=lambda el: el.text(deep=True),
+    stripped_text=lambda el: el.text(deep=True, separator="", strip=True),
+)
+
+
+def _add_clickable(el, attrs, state):
+    tag = el.tag
+    text = (state["be"].text(el) or attrs.get('value') or attrs.get('aria-label') or "").strip()
+    role = "link" if tag == "a" else "button" if tag == "button" else "input"
     
-    for table in soup.find_all("table"):
-        headers = [th.get_text(strip=True) for th in table.find_all("th")]
-        rows = []
-        for tr in table.find_all("tr")[:5]:
-            rows.append([td.get_text(strip=True) for td in tr.find_all("td")])
-        comps["components"].append({
-            "type": "table",
-            "headers": headers,
-            "sample_rows": rows
+    itype = attrs.get('type') or ""
+    state["clickables"].append({
+        "type": "clickable",
+        "tag": tag,
+        "role": role,
+        "input_type": itype,
+        "text": text[:200],
+        "id": attrs.get('id'),
+        "classes": (attrs.get('class') or "").split()
+    })
+
+
+def _handle_clickable(el, state):
+    _add_clickable(el, state["be"].attrs(el), state)
+
+
+def _handle_input(el, state):
+    attrs = state["be"].attrs(el)
+    _add_clickable(el, attrs, state)
+    itype = attrs.get('type')
+    if itype == "password":
+        state["auth"] = True
+    if itype == "search" or attrs.get('name') == "q":
+        state["search"] = True
+
+
+def _handle_form(el, state):
+    be = state["be"]
+    attrs = be.attrs(el)
+    fields = []
+    for inp in be.find(el, ("input", "textarea", "select")):
+        inp_attrs = be.attrs(inp)
+        fields.append({
+            "name": inp_attrs.get('name'),
+            "type": inp_attrs.get('type') or inp.tag,
+            "placeholder": inp_attrs.get('placeholder') or "",
+            "required": bool(inp_attrs.get('required')),
         })
+    state["forms"].append({
+        "type": "form",
+        "id": attrs.get('id'),
+        "action": attrs.get('action'),
+        "method": attrs.get('method') or "get",
+        "fields": fields
+    })
 
-    
-    imgs = soup.find_all("img")
+
+def _handle_nav(el, state):
+    be = state["be"]
+    links = [be.stripped_text(a) for a in be.find(el, ("a",)) if be.attrs(a).get('href') is not None]
+    state["navs"].append({
+        "type": "nav",
+        "links": links[:30]
+    })
+
+
+def _handle_list(el, state):
+    be = state["be"]
+    items = [be.stripped_text(li) for li in be.find(el, ("li",))]
+    state["lists"].append({
+        "type": "list",
+        "num_items": len(items),
+        "sample_items": items[:10]
+    })
+
+
+def _handle_table(el, state):
+    be = state["be"]
+    headers = [be.stripped_text(th) for th in be.find(el, ("th",))]
+    rows = []
+    for i, tr in enumerate(be.find(el, ("tr",))):
+        if i == 5:
+            break
+        rows.append([be.stripped_text(td) for td in be.find(tr, ("td",))])
+    state["tables"].append({
+        "type": "table",
+        "headers": headers,
+        "sample_rows": rows
+    })
+
+
+def _handle_img(el, state):
+    state["images"].append(state["be"].attrs(el).get('src'))
+
+
+def _handle_heading(el, state):
+    state["headings"][el.tag].append({"tag": el.tag, "text": state["be"].stripped_text(el)[:150]})
+
+
+_HANDLERS = {
+    "button": _handle_clickable,
+    "a": _handle_clickable,
+    "input": _handle_input,
+    "form": _handle_form,
+    "nav": _handle_nav,
+    "ul": _handle_list,
+    "ol": _handle_list,
+    "table": _handle_table,
+    "img": _handle_img,
+}
+_HANDLERS.update((h, _handle_heading) for h in HEADING_TAGS)
+_HANDLED_TAGS = tuple(_HANDLERS)
+
+
+# Used when a page's text must go in as bytes; the text is already decoded, so any
+# charset the document declares no longer applies.
+_UTF8_HTML_PARSER = lxml.html.HTMLParser(encoding="utf-8")
+
+
+def parse_lxml(html_content):
+    """Parse page HTML with lxml.html; returns None for empty/unparseable documents."""
+    try:
+        return lxml.html.fromstring(html_content)
+    except ValueError:
+        # lxml rejects str input that carries an <?xml ... encoding=...?> declaration.
+        if not isinstance(html_content, str):
+            return None
+        try:
+            return lxml.html.fromstring(html_content.encode("utf-8"), parser=_UTF8_HTML_PARSER)
+        except (etree.ParserError, ValueError):
+            return None
+    except etree.ParserError:
+        return None
+
+
+def parse_lexbor(html_content):
+    """Parse page HTML with selectolax's lexbor parser; only valid when prefer_lexbor() is true."""
+    return LexborHTMLParser(html_content)
+
+
+def parse_for_extraction(html_content):
+    """Parse page HTML with the preferred parser; lxml failures give None."""
+    if prefer_lexbor():
+        return parse_lexbor(html_content)
+    return parse_lxml(html_content)
+
+
+def extract_components_from_html(html_content, url=None):
+    return extract_components_from_tree(parse_for_extraction(html_content), url=url)
+
+
+def extract_components_from_tree(tree, url=None):
+    """Same as extract_components_from_html, for a document already parsed with lxml.html or lexbor."""
+    if _SELECTOLAX_AVAILABLE and isinstance(tree, LexborHTMLParser):
+        be, root = _LEXBOR, tree.root
+        title_el = tree.css_first("title")
+        # lxml reports an empty <title> as None; match it.
+        title = (title_el.text() or None) if title_el is not None else ""
+    else:
+        be, root = _LXML, tree
+        title_el = tree.find(".//title") if tree is not None else None
+        title = title_el.text if title_el is not None else ""
+    comps = {"url": url, "title": title, "components": []}
+    if root is None:
+        return comps
+
+    state = {
+        "be": be,
+        "clickables": [], "forms": [], "navs": [], "lists": [], "tables": [], "images": [],
+        "headings": {h: [] for h in HEADING_TAGS},
+        "auth": False, "search": False,
+    }
+    # One walk over the document, filtered in C and yielded in document order.
+    for el in be.find(root, _HANDLED_TAGS):
+        _HANDLERS[el.tag](el, state)
+
+    # Keep the component grouping stable: clickables, forms, navs, lists, tables, images, headings.
+    components = comps["components"]
+    components.extend(state["clickables"])
+    components.extend(state["forms"])
+    components.extend(state["navs"])
+    components.extend(state["lists"])
+    components.extend(state["tables"])
+
+    imgs = state["images"]
     if imgs:
-        comps["components"].append({
+        components.append({
             "type": "images",
             "count": len(imgs),
-            "samples": [img.get('src') for img in imgs[:10]]
+            "samples": imgs[:10]
         })
 
-    
-    headings = []
-    for h in ['h1','h2','h3','h4']:
-        for tag in soup.find_all(h):
-            headings.append({"tag": h, "text": tag.get_text(strip=True)[:150]})
+    headings = [item for h in HEADING_TAGS for item in state["headings"][h]]
     if headings:
-        comps["components"].append({"type":"headings", "items": headings[:50]})
+        components.append({"type":"headings", "items": headings[:50]})
 
-    
-    if soup.find('input', {'type':'password'}):
+    if state["auth"]:
         comps.setdefault("features", []).append("authentication/login_form_detected")
 
-    
-    if soup.find('input', {'type':'search'}) or soup.find('input', {'name':'q'}):
+    if state["search"]:
         comps.setdefault("features", []).append("search_feature_detected")
 
     return comps
 
-def extract_from_crawl_index(crawl_index_path):
-    with open(crawl_index_path, "r", encoding="utf-8") as f:
-        idx = json.load(f)
-    pages = []
-    for url, meta in idx.items():
-        try:
-            with open(meta["html"], "r", encoding="utf-8") as fh:
-                html = fh.read()
-        except Exception:
-            html = meta.get("text_snippet", "")
-        comps = extract_components_from_html(html, url=url)
-        pages.append(comps)
-    return {"pages": pages, "domain": urlparse(list(idx.keys())[0]).netloc}
+# Below this many pages the process start-up and pickling cost more than the parse.
+PARALLEL_MIN_PAGES = 8
+EXTRACT_CHUNKSIZE = 4
+
+
+def _extract_one(item):
+    url, html_path, fallback_text = item
+    try:
+        with open(html_path, "r", encoding="utf-8") as fh:
+            html = fh.read()
+    except Exception:
+        html = fallback_text
+    return extract_components_from_html(html, url=url)
+
+
+def _field(meta, name, default=None):
+    # crawl() hands over CrawlPage records; a reloaded crawl index has plain dicts.
+    if isinstance(meta, dict):
+        return meta.get(name, default)
+    return getattr(meta, name, default)
+
+
+def extract_from_crawl_obj(crawl_res, workers=None):
+    """Build the UX spec from crawl() results already in memory (url -> page record)."""
+    # Pages the crawler already extracted (their "ux" field) are reused as-is; only the rest are parsed.
+    metas = list(crawl_res.items())
+    if not metas:
+        raise ValueError("crawl produced no pages")
+    pages = [_field(meta, "ux") for _, meta in metas]
+    todo = [i for i, comps in enumerate(pages) if comps is None]
+    items = [(metas[i][0], _field(metas[i][1], "html") or "", _field(metas[i][1], "text_snippet", "")) for i in todo]
+    if len(items) < PARALLEL_MIN_PAGES or workers == 1:
+        parsed = [_extract_one(item) for item in items]
+    else:
+        # Parsing is CPU-bound, so fan pages out across processes rather than threads.
+        with ProcessPoolExecutor(max_workers=workers) as ex:
+            parsed = list(ex.map(_extract_one, items, chunksize=EXTRACT_CHUNKSIZE))
+    for i, comps in zip(todo, parsed):
+        pages[i] = comps
+    return {"pages": pages, "domain": urlparse(metas[0][0]).netloc}
+
+
+def extract_from_crawl_index(crawl_index_path, workers=None):
+    return extract_from_crawl_obj(load_artifact(crawl_index_path), workers=workers)
 
 if __name__ == "__main__":
     import argparse
     parser = argparse.ArgumentParser()
-    parser.add_argument("crawl_index")
+    parser.add_argument("crawl_index", help="crawl_index.json or crawl_index.msgpack")
     parser.add_argument("--out", default="ux_spec.json")
+    parser.add_argument("--pretty", action="store_true", help="Indent the spec for reading (compact by default)")
+    parser.add_argument("--workers", type=int, default=None, help="Extraction processes (default: CPU count)")
     args = parser.parse_args()
-    spec = extract_from_crawl_index(args.crawl_index)
-    with open(args.out, "w", encoding="utf-8") as f:
-        json.dump(spec, f, indent=2)
+    spec = extract_from_crawl_index(args.crawl_index, workers=args.workers)
+    dump_file(spec, args.out, indent=args.pretty)
     print("UX spec written to", args.out)
@@ -1,10 +1,15 @@
 # generator.py
+import io
+import logging
 import os
-import json
+import tarfile
+import time
 import zipfile
 from dotenv import load_dotenv
 from datetime import datetime
+from types import MappingProxyType
 import re
+from serialization import dumps, loads, load_file
 
 # Try importing ollama, but don't crash if it's not installed / reachable.
 try:
@@ -13,22 +18,32 @@ try:
 except Exception:
     _OLLAMA_AVAILABLE = False
 
+# zstandard is optional; without it --compression zstd falls back to a fast zip.
+try:
+    import zstandard
+    _ZSTD_AVAILABLE = True
+except Exception:
+    _ZSTD_AVAILABLE = False
+
 load_dotenv()
 
+log = logging.getLogger(__name__)
+
 PROPRIETARY_MARKERS = [
     "instagram", "facebook", "whatsapp", "uber", "airbnb",
     "tiktok", "twitter", "snapchat", "x.com"
 ]
+_PROPRIETARY_RE = re.compile("|".join(map(re.escape, PROPRIETARY_MARKERS)))
 
 
 def likely_proprietary_spec(ux_spec):
     domain = ux_spec.get("domain", "") or ""
-    if any(x in domain.lower() for x in PROPRIETARY_MARKERS):
+    if _PROPRIETARY_RE.search(domain.lower()):
         return True
 
     for p in ux_spec.get("pages", []):
         title = (p.get("title") or "").lower()
-        if any(x in title for x in PROPRIETARY_MARKERS):
+        if _PROPRIETARY_RE.search(title):
             return True
 
     return False
@@ -38,6 +53,9 @@ def likely_proprietary_spec(ux_spec):
 # SANITIZER — REMOVES MARKDOWN, TRIPLE QUOTES, EXTRACTS JSON
 # ----------------------------------------------------------
 
+_FENCE_RE = re.compile(r"```json\s*([\s\S]*?)```|```([\s\S]*?)```", re.IGNORECASE)
+_BRACE_RE = re.compile(r"[{}]")
+
 def sanitize_llm_output(text):
     """
     Strip common surrounding markdown fences and extract the first
@@ -50,7 +68,7 @@ def sanitize_llm_output(text):
 
     # 1. Remove fenced code blocks ```...``` and try to capture content inside 'json' block
     # We use non-greedy matching `*?`
-    fenced_content = re.search(r"```json\s*([\s\S]*?)```|```([\s\S]*?)```", text, flags=re.IGNORECASE)
+    fenced_content = _FENCE_RE.search(text)
     
     if fenced_content:
         # Prioritize content captured inside a json fence (group 1), otherwise use content from any fence (group 2)
@@ -76,16 +94,17 @@ def sanitize_llm_output(text):
     text_to_parse = text_to_parse[start:]
     
     # Naive balancing scan from the start of the object {
+    # Jump from brace to brace with a compiled regex so the scan runs in C rather
+    # than dispatching Python bytecode for every character of the response.
     depth = 0
     end_index = -1
-    for i in range(len(text_to_parse)):
-        ch = text_to_parse[i]
-        if ch == "{":
+    for m in _BRACE_RE.finditer(text_to_parse):
+        if m.group() == "{":
             depth += 1
-        elif ch == "}":
+        else:
             depth -= 1
             if depth == 0:
-                end_index = i
+                end_index = m.start()
                 break
     if end_index == -1:
         raise RuntimeError("Could not find end of JSON object in LLM output (unbalanced braces):\n" + text_to_parse[:1000])
@@ -98,131 +117,281 @@ def sanitize_llm_output(text):
 # PROMPT WITHOUT NESTED F-STRINGS (SAFE)
 # ----------------------------------------------------------
 
+PROMPT_SPEC_CHARS = 6000
+
+
+def spec_excerpt(ux_spec, budget=PROMPT_SPEC_CHARS):
+    """
+    Compact JSON of ux_spec cut to `budget` chars. Pages are measured one at a time
+    and serialization stops at the first page past the budget, so a large crawl is
+    never fully encoded (or pretty-printed) just to be sliced off.
+    """
+    pages = ux_spec.get("pages") or []
+    used = 0
+    keep = 0
+    for page in pages:
+        if used >= budget:
+            break
+        used += len(dumps(page, indent=False)) + 1
+        keep += 1
+    trimmed = {k: (pages[:keep] if k == "pages" else v) for k, v in ux_spec.items()}
+    return dumps(trimmed, indent=False)[:budget]
+
+
+# Everything that does not depend on the crawled site. It is sent first, as the system
+# message, so consecutive runs share an identical prompt prefix that the model server
+# can serve from its prompt/KV cache; only the user message below changes per run.
+SCAFFOLD_SYSTEM_PROMPT = (
+    "Return ONLY valid JSON containing a 'files' mapping.\n"
+    "You MUST output ONLY valid JSON.\n"
+    "NO markdown. NO ``` blocks. NO commentary. NO triple quotes.\n\n"
+    "RULES:\n"
+    "- Output a single JSON object with top-level key \"files\".\n"
+    "- Each file value MUST be a JSON string containing \\n newlines.\n"
+    "- The content of server.py must fully support serving the React build.\n"
+    "- The frontend/index.html MUST NOT contain a reference to /src/main.jsx, as Vite injects the production build script automatically.\n"
+    "- NEVER use markdown formatting.\n"
+    "- NEVER wrap code in backticks.\n"
+    "- NEVER output extra explanation outside JSON.\n\n"
+    "GENERATE THIS PROJECT STRUCTURE:\n\n"
+    "1. Backend (Flask):\n"
+    "   - server.py:\n"
+    "        * serves API at /api/*\n"
+    "        * React build served from /frontend/dist using a custom route (static_folder=None)\n"
+    "        * fallback route returns index.html\n\n"
+    "2. requirements.txt:\n"
+    "        flask\n"
+    "        flask_cors\n\n"
+    "3. React Frontend (Vite + React):\n"
+    "   folder: frontend/\n\n"
+    "   MUST INCLUDE:\n"
+    "   - frontend/package.json\n"
+    "   - frontend/vite.config.js\n"
+    "   - frontend/index.html\n"
+    "   - frontend/src/main.jsx\n"
+    "   - frontend/src/App.jsx\n"
+    "   - frontend/src/components/AutoLayout.jsx\n\n"
+    "   App.jsx should fetch /api/data and render components based on the UX SPEC.\n\n"
+    "4. README.md: instructions for backend + frontend setup\n\n"
+    "OUTPUT EXACTLY AS JSON:\n"
+    "{\n"
+    "  \"files\": {\n"
+    "    \"server.py\": \"...\",\n"
+    "    \"requirements.txt\": \"...\",\n"
+    "    \"frontend/package.json\": \"...\",\n"
+    "    \"frontend/vite.config.js\": \"...\",\n"
+    "    \"frontend/index.html\": \"...\",\n"
+    "    \"frontend/src/main.jsx\": \"...\",\n"
+    "    \"frontend/src/App.jsx\": \"...\",\n"
+    "    \"frontend/src/components/AutoLayout.jsx\": \"...\",\n"
+    "    \"README.md\": \"...\"\n"
+    "  }\n"
+    "}\n"
+)
+
+
 def build_prompt_from_spec(ux_spec, app_name="GeneratedApp"):
+    """Per-run user message; the fixed instructions live in SCAFFOLD_SYSTEM_PROMPT."""
     # Keep the ux_spec string truncated to a safe length to avoid model context overflow
-    ux_json = json.dumps(ux_spec, indent=2)[:6000]
-
-    template = (
-        "You MUST output ONLY valid JSON.\n"
-        "NO markdown. NO ``` blocks. NO commentary. NO triple quotes.\n\n"
-        "RULES:\n"
-        "- Output a single JSON object with top-level key \"files\".\n"
-        "- Each file value MUST be a JSON string containing \\n newlines.\n"
-        "- The content of server.py must fully support serving the React build.\n"
-        "- The frontend/index.html MUST NOT contain a reference to /src/main.jsx, as Vite injects the production build script automatically.\n"
-        "- NEVER use markdown formatting.\n"
-        "- NEVER wrap code in backticks.\n"
-        "- NEVER output extra explanation outside JSON.\n\n"
-        "GENERATE THIS PROJECT STRUCTURE:\n\n"
-        "1. Backend (Flask):\n"
-        "   - server.py:\n"
-        "        * serves API at /api/*\n"
-        "        * React build served from /frontend/dist using a custom route (static_folder=None)\n"
-        "        * fallback route returns index.html\n\n"
-        "2. requirements.txt:\n"
-        "        flask\n"
-        "        flask_cors\n\n"
-        "3. React Frontend (Vite + React):\n"
-        "   folder: frontend/\n\n"
-        "   MUST INCLUDE:\n"
-        "   - frontend/package.json\n"
-        "   - frontend/vite.config.js\n"
-        "   - frontend/index.html\n"
-        "   - frontend/src/main.jsx\n"
-        "   - frontend/src/App.jsx\n"
-        "   - frontend/src/components/AutoLayout.jsx\n\n"
-        "   App.jsx should fetch /api/data and render components based on the UX SPEC.\n\n"
-        "4. README.md: instructions for backend + frontend setup\n\n"
+    ux_json = spec_excerpt(ux_spec)
+
+    return (
+        "APP NAME: " + app_name + "\n\n"
         "UX SPEC FOR CONTEXT (Use this to design the front-end components and layout in App.jsx):\n"
         + ux_json
-        + "\n\n"
-        "OUTPUT EXACTLY AS JSON:\n"
-        "{\n"
-        "  \"files\": {\n"
-        "    \"server.py\": \"...\",\n"
-        "    \"requirements.txt\": \"...\",\n"
-        "    \"frontend/package.json\": \"...\",\n"
-        "    \"frontend/vite.config.js\": \"...\",\n"
-        "    \"frontend/index.html\": \"...\",\n"
-        "    \"frontend/src/main.jsx\": \"...\",\n"
-        "    \"frontend/src/App.jsx\": \"...\",\n"
-        "    \"frontend/src/components/AutoLayout.jsx\": \"...\",\n"
-        "    \"README.md\": \"...\"\n"
-        "  }\n"
-        "}\n"
+        + "\n"
     )
 
-    return template
-
 
 # ----------------------------------------------------------
 # OLLAMA CALL (optional) WITH SAFE ERROR HANDLING
 # ----------------------------------------------------------
 
-def call_ollama_for_files(prompt, model="llama3.2:3b", max_tokens=4000):
+# While streaming, try to parse the accumulated reply every this many chunks.
+STREAM_CHECK_CHUNKS = 50
+
+
+def parse_files_payload(raw):
+    """Sanitize raw model text and return its 'files' mapping; raises on anything else."""
+    clean = sanitize_llm_output(raw)
+    parsed = loads(clean)
+
+    if "files" not in parsed or not isinstance(parsed["files"], dict):
+        raise RuntimeError("'files' key missing or invalid in model output")
+
+    return parsed["files"]
+
+
+def call_ollama_for_files(prompt, model="llama3.2:3b", max_tokens=4000, keep_alive=None):
     """
     Call ollama.chat and return the parsed 'files' mapping.
     If Ollama isn't available or fails, raise RuntimeError so the caller can fallback.
+    keep_alive (e.g. "30m") keeps the model, and its cached prompt prefix, loaded between runs.
+
+    The reply is streamed and checked in batches of STREAM_CHECK_CHUNKS chunks; once it
+    holds a complete 'files' object the stream is closed, so any trailing commentary the
+    model adds after the JSON is never generated.
     """
     if not _OLLAMA_AVAILABLE:
         raise RuntimeError("Ollama library not available in this environment.")
 
     # NOTE: Ensure this model is available on your local Ollama server.
     try:
-        response = ollama.chat(
+        stream = ollama.chat(
             model=model,
             messages=[
-                {"role": "system", "content": "Return ONLY valid JSON containing a 'files' mapping."},
+                {"role": "system", "content": SCAFFOLD_SYSTEM_PROMPT},
                 {"role": "user", "content": prompt}
             ],
-            options={"num_predict": max_tokens}
+            options={"num_predict": max_tokens},
+            keep_alive=keep_alive,
+            stream=True,
         )
 
-        raw = response.get("message", {}).get("content", "")
+        parts = []
+        batch_has_brace = False
+        try:
+            for i, chunk in enumerate(stream, 1):
+                piece = chunk.get("message", {}).get("content", "") or ""
+                parts.append(piece)
+                batch_has_brace = batch_has_brace or "}" in piece
+                # Only a batch that contained a closing brace can have completed the object.
+                if i % STREAM_CHECK_CHUNKS == 0 and batch_has_brace:
+                    batch_has_brace = False
+                    try:
+                        return parse_files_payload("".join(parts))
+                    except (RuntimeError, ValueError):
+                        pass
+        finally:
+            close = getattr(stream, "close", None)
+            if close is not None:
+                close()
+
+        raw = "".join(parts)
         if not raw:
             raise RuntimeError("Ollama returned empty response")
 
-        clean = sanitize_llm_output(raw)
-        parsed = json.loads(clean)
-
-        if "files" not in parsed or not isinstance(parsed["files"], dict):
-            raise RuntimeError("'files' key missing or invalid in model output")
-
-        return parsed["files"]
+        return parse_files_payload(raw)
 
     except Exception as e:
         # Give a clear error message back to caller
         raise RuntimeError(f"Ollama call failed: {e}")
 
 
+def warm_model(model="llama3.2:3b", keep_alive=None):
+    """
+    Load the model and prefill SCAFFOLD_SYSTEM_PROMPT ahead of the real request, so that
+    request only has to process the per-run spec. Meant to run while the crawl is busy.
+    Best effort: returns False instead of raising.
+    """
+    if not _OLLAMA_AVAILABLE:
+        return False
+    try:
+        ollama.chat(
+            model=model,
+            messages=[{"role": "system", "content": SCAFFOLD_SYSTEM_PROMPT}],
+            options={"num_predict": 1},
+            keep_alive=keep_alive,
+        )
+        return True
+    except Exception:
+        return False
+
+
 # ----------------------------------------------------------
 # ZIP BUILDER
 # ----------------------------------------------------------
 
-def make_zip(files_map, out_path):
-    with zipfile.ZipFile(out_path, "w", zipfile.ZIP_DEFLATED) as z:
-        for path, content in files_map.items():
-            # ensure directories exist in zip entries
-            if not isinstance(content, (str, bytes)):
-                content = json.dumps(content, indent=2)
-            # normalize path separators
-            arcname = path.replace("\\", "/")
-            z.writestr(arcname, content)
-    print("Wrote", out_path)
+# Already-compressed formats: deflating them again only burns CPU.
+STORED_EXTENSIONS = (".png", ".jpg", ".jpeg", ".gif", ".webp", ".ico", ".woff", ".woff2", ".zip", ".gz")
+ZIP_CHUNK_SIZE = 1024 * 1024
+
+# --compression presets for the zip: (method, deflate level). Deflate level 1 is
+# several times faster than the default 6 and barely larger on source files.
+# "zstd" writes a multi-threaded .tar.zst instead of a zip.
+ZIP_COMPRESSION = {
+    "none": (zipfile.ZIP_STORED, None),
+    "fast": (zipfile.ZIP_DEFLATED, 1),
+}
+COMPRESSION_CHOICES = ("none", "fast", "zstd")
+DEFAULT_COMPRESSION = "fast"
+ZSTD_LEVEL = 3
+
+
+def _archive_entries(files_map):
+    for path, content in files_map.items():
+        if not isinstance(content, (str, bytes)):
+            content = dumps(content)
+        # normalize path separators
+        arcname = path.replace("\\", "/")
+        # encode once; writers stream the buffer instead of copying it again
+        yield arcname, memoryview(content.encode("utf-8") if isinstance(content, str) else content)
+
+
+# ZipFile.open() takes an entry's level from its ZipInfo, not the archive's compresslevel.
+# That attribute is public as compress_level from Python 3.13; older versions only have _compresslevel.
+_ZIPINFO_LEVEL = "compress_level" if hasattr(zipfile.ZipInfo, "compress_level") else "_compresslevel"
+
+
+def make_zip(files_map, out_path, compression=DEFAULT_COMPRESSION):
+    method, level = ZIP_COMPRESSION[compression]
+    date_time = time.localtime()[:6]
+    with zipfile.ZipFile(out_path, "w", method, compresslevel=level) as z:
+        for arcname, data in _archive_entries(files_map):
+            # Same entry metadata writestr() gives a name: current time, rw------- permissions.
+            entry = zipfile.ZipInfo(arcname, date_time=date_time)
+            entry.external_attr = 0o600 << 16
+            if arcname.lower().endswith(STORED_EXTENSIONS):
+                entry.compress_type = zipfile.ZIP_STORED
+            else:
+                entry.compress_type = method
+                setattr(entry, _ZIPINFO_LEVEL, level)
+            with z.open(entry, "w", force_zip64=len(data) > zipfile.ZIP64_LIMIT) as zf:
+                for i in range(0, len(data), ZIP_CHUNK_SIZE):
+                    zf.write(data[i:i + ZIP_CHUNK_SIZE])
+    log.info("Wrote %s", out_path)
+
+
+def make_tar_zst(files_map, out_path):
+    # Deflate compresses each zip entry on one core; zstd's threaded mode uses all of them.
+    cctx = zstandard.ZstdCompressor(level=ZSTD_LEVEL, threads=-1)
+    # Whole seconds: a fractional mtime makes tarfile add a PAX header to every entry.
+    now = int(time.time())
+    with open(out_path, "wb") as fh, cctx.stream_writer(fh) as zw, tarfile.open(fileobj=zw, mode="w|") as tar:
+        for arcname, data in _archive_entries(files_map):
+            info = tarfile.TarInfo(arcname)
+            info.size = len(data)
+            info.mtime = now
+            tar.addfile(info, io.BytesIO(data))
+    log.info("Wrote %s", out_path)
 
 
 # ----------------------------------------------------------
 # DEFAULT FAILSAFE FILES (if model not available or fails)
 # ----------------------------------------------------------
 
-DEFAULT_FILES = {
+# Read-only so generate_scaffold can layer model output over it without copying.
+DEFAULT_FILES = MappingProxyType({
     "server.py": (
         "import os\n"
+        "from pathlib import Path\n"
         "from flask import Flask, send_from_directory, jsonify, request\n"
         "from flask_cors import CORS\n\n"
         "# Set static_folder=None, relying solely on serve_frontend for asset handling.\n"
         "app = Flask(__name__, static_folder=None)\n"
         "CORS(app)\n\n"
+        "# Where Vite places its production output; resolved once at startup.\n"
+        "DIST_DIR = Path(os.getcwd()) / 'frontend' / 'dist'\n"
+        "INDEX_PATH = DIST_DIR / 'index.html'\n"
+        "_index_found = False\n"
+        "# Vite fingerprints files under assets/, so browsers may cache them for a year.\n"
+        "ASSET_MAX_AGE = 31536000\n\n"
+        "def index_exists():\n"
+        "    # Only a positive answer is cached, so a build made after startup is still picked up.\n"
+        "    global _index_found\n"
+        "    if not _index_found:\n"
+        "        _index_found = INDEX_PATH.is_file()\n"
+        "    return _index_found\n\n"
         "@app.route('/api/data', methods=['GET'])\n"
         "def api_data():\n"
         "    sample = {'message': 'Hello from Flask backend', 'ok': True}\n"
@@ -243,43 +412,36 @@ DEFAULT_FILES = {
         "@app.route('/', defaults={'path': ''})\n"
         "@app.route('/<path:path>')\n"
         "def serve_frontend(path):\n"
-        "    ""\n"
-        "    Serves the built frontend assets (JS/CSS/Index.html) from the frontend/dist directory.\n"
-        "    This acts as the Single Page Application (SPA) catch-all.\n"
-        "    ""\n"
-        "    # Define the directory where Vite places its production output\n"
-        "    dist_dir = os.path.join(os.getcwd(), 'frontend', 'dist')\n"
-        "    \n"
-        "    # Construct the full path to the requested file (e.g., assets/index-xxx.js)\n"
-        "    requested_file = os.path.join(dist_dir, path)\n"
+        "    # Serves the built frontend assets (JS/CSS/index.html) from frontend/dist.\n"
+        "    # This acts as the Single Page Application (SPA) catch-all.\n"
         "\n"
-        "    # 1. If a specific asset file is requested and exists (handles assets/foo.js)\n"
-        "    if path != '' and os.path.exists(requested_file):\n"
-        "        # Serve the file by using its directory and filename\n"
-        "        directory = os.path.dirname(requested_file)\n"
-        "        filename = os.path.basename(requested_file)\n"
-        "        return send_from_directory(directory, filename)\n"
+        "    # 1. If a specific asset file is requested and exists (handles assets/foo.js); is_file() is a single stat\n"
+        "    if path and (DIST_DIR / path).is_file():\n"
+        "        max_age = ASSET_MAX_AGE if path.startswith('assets/') else None\n"
+        "        return send_from_directory(DIST_DIR, path, max_age=max_age)\n"
         "\n"
         "    # 2. If path is root or asset not found, serve the main index.html (SPA fallback)\n"
-        "    index_path = os.path.join(dist_dir, 'index.html')\n"
-        "    if os.path.exists(index_path):\n"
-        "        return send_from_directory(dist_dir, 'index.html')\n"
+        "    if index_exists():\n"
+        "        return send_from_directory(DIST_DIR, 'index.html')\n"
         "        \n"
         "    # 3. Fallback message if the build hasn't been run\n"
         "    return jsonify({'message': 'Frontend build not found. Run `cd frontend && npm install && npm run build`.'}), 200\n\n"
         "if __name__ == '__main__':\n"
+        "    # Development server only. In production run a WSGI server instead, e.g.\n"
+        "    #   gunicorn -w $(nproc) -k gthread --threads 4 server:app\n"
         "    # Use 0.0.0.0 for easier local testing in containers/VMs if needed\n"
-        "    app.run(host='0.0.0.0', port=int(os.environ.get('PORT', 5000)), debug=True)\n"
+        "    debug = os.environ.get('FLASK_ENV') == 'development'\n"
+        "    app.run(host='0.0.0.0', port=int(os.environ.get('PORT', 5000)), debug=debug)\n"
     ),
     "requirements.txt": "flask\nflask_cors\n",
-    "frontend/package.json": json.dumps({
+    "frontend/package.json": dumps({
         "name": "react-app",
         "version": "1.0.0",
         "private": True,
         "scripts": {"dev": "vite", "build": "vite build", "preview": "vite preview"},
         "dependencies": {"react": "^18.0.0", "react-dom": "^18.0.0"},
         "devDependencies": {"vite": "^5.0.0", "@vitejs/plugin-react": "^4.0.0"}
-    }, indent=2),
+    }),
     "frontend/vite.config.js": (
         "import { defineConfig } from 'vite';\n"
         "import react from '@vitejs/plugin-react';\n"
@@ -355,17 +517,19 @@ DEFAULT_FILES = {
         "3. `npm run build` to create the production files.\\n"
         "4. Then run the backend to serve the built app.\\n"
     )
-}
+})
 
 
 # ----------------------------------------------------------
 # MAIN GENERATOR
 # ----------------------------------------------------------
 
-def generate_scaffold(ux_spec, app_name="ReactApp", model="llama3.2:3b", out_zip=None):
+def generate_scaffold(ux_spec, app_name="ReactApp", model="llama3.2:3b", out_zip=None, keep_alive=None,
+                      compression=DEFAULT_COMPRESSION):
     """
     Generate a scaffold zip. Attempts to call Ollama to produce
     a richer set of files; on failure falls back to DEFAULT_FILES.
+    compression is one of COMPRESSION_CHOICES; "zstd" produces a .tar.zst archive.
     """
     if likely_proprietary_spec(ux_spec):
         raise RuntimeError("Proprietary app detected — cannot clone or reproduce a verbatim UI.")
@@ -375,22 +539,25 @@ def generate_scaffold(ux_spec, app_name="ReactApp", model="llama3.2:3b", out_zip
     files = {}
     # Attempt to get model-generated files
     try:
-        files = call_ollama_for_files(prompt, model=model) if _OLLAMA_AVAILABLE else {}
+        files = call_ollama_for_files(prompt, model=model, keep_alive=keep_alive) if _OLLAMA_AVAILABLE else {}
     except Exception as e:
         # Model failed — log and fall back to defaults
-        print("Model generation failed:", e)
+        log.warning("Model generation failed, using default files: %s", e)
         files = {}
 
     # Merge with safe defaults to ensure required files exist and have proper server.py
-    # Model files (if any) win; otherwise defaults are used.
-    final_files = DEFAULT_FILES.copy()
-    # overlay model-provided files (string values expected)
+    # Model files (if any) win; otherwise defaults are used. Only model values are
+    # converted; default strings are referenced from the read-only DEFAULT_FILES.
+    overlay = {}
     for k, v in files.items():
         if isinstance(v, (dict, list)):
             # convert to pretty JSON
-            final_files[k] = json.dumps(v, indent=2)
+            overlay[k] = dumps(v)
         else:
-            final_files[k] = str(v)
+            overlay[k] = str(v)
+    # Every required frontend/backend file is a DEFAULT_FILES key, so this also guarantees they exist.
+    final_files = {k: overlay.pop(k, v) for k, v in DEFAULT_FILES.items()}
+    final_files.update(overlay)
 
     # Ensure server.py is a reasonable full file (not a 1-liner) — if model provided server.py but it's tiny, replace with default
     sp = final_files.get("server.py", "")
@@ -398,28 +565,23 @@ def generate_scaffold(ux_spec, app_name="ReactApp", model="llama3.2:3b", out_zip
         final_files["server.py"] = DEFAULT_FILES["server.py"]
 
     # Ensure requirements.txt exists
-    if "requirements.txt" not in final_files or not final_files["requirements.txt"].strip():
+    if not final_files["requirements.txt"].strip():
         final_files["requirements.txt"] = DEFAULT_FILES["requirements.txt"]
 
-    # Ensure frontend minimal files exist
-    needed_frontend = [
-        "frontend/package.json",
-        "frontend/vite.config.js",
-        "frontend/index.html",
-        "frontend/src/main.jsx",
-        "frontend/src/App.jsx",
-        "frontend/src/components/AutoLayout.jsx",
-    ]
-    for fn in needed_frontend:
-        if fn not in final_files:
-            final_files[fn] = DEFAULT_FILES.get(fn, "")
+    if compression == "zstd" and not _ZSTD_AVAILABLE:
+        log.warning("zstandard not installed; writing a fast zip instead")
+        compression = DEFAULT_COMPRESSION
 
     # Create output zip name if not supplied
     if not out_zip:
         safe_name = app_name.replace(" ", "_")
-        out_zip = f"{safe_name}_scaffold_{datetime.utcnow().strftime('%Y%m%d%H%M%S')}.zip"
+        ext = ".tar.zst" if compression == "zstd" else ".zip"
+        out_zip = f"{safe_name}_scaffold_{datetime.utcnow().strftime('%Y%m%d%H%M%S')}{ext}"
 
-    make_zip(final_files, out_zip)
+    if compression == "zstd":
+        make_tar_zst(final_files, out_zip)
+    else:
+        make_zip(final_files, out_zip, compression=compression)
     return out_zip
 
 
@@ -434,14 +596,17 @@ if __name__ == "__main__":
     parser.add_argument("--app_name", default="GeneratedReactApp")
     parser.add_argument("--model", default="llama3.2:3b")
     parser.add_argument("--out", default=None)
+    parser.add_argument("--keep_alive", default=None, help="How long Ollama keeps the model (and prompt cache) loaded, e.g. 30m")
+    parser.add_argument("--compression", choices=COMPRESSION_CHOICES, default=DEFAULT_COMPRESSION)
     args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
 
     spec_path = args.ux_spec_json
     if not os.path.exists(spec_path):
         raise SystemExit("Spec file not found: " + spec_path)
 
-    with open(spec_path, "r", encoding="utf-8") as fh:
-        ux_spec = json.load(fh)
+    ux_spec = load_file(spec_path)
 
-    zip_path = generate_scaffold(ux_spec, app_name=args.app_name, model=args.model, out_zip=args.out)
+    zip_path = generate_scaffold(ux_spec, app_name=args.app_name, model=args.model, out_zip=args.out, keep_alive=args.keep_alive,
+                                  compression=args.compression)
     print("Scaffold generated:", zip_path)
\ No newline at end of file
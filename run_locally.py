@@ -1,54 +1,386 @@
 import argparse
-import json
+import contextlib
+import hashlib
+import logging
 import subprocess
 import os
+import socket
 import sys
-from crawler import crawl
-from extractor import extract_from_crawl_index
-from gen_alpha import generate_scaffold
+import threading
+import time
+from urllib.parse import urlparse
 
-import asyncio
+log = logging.getLogger(__name__)
 
-def run_pipeline(url, outdir="run_output", max_pages=15, max_depth=2, app_name="GeneratedApp"):
-    os.makedirs(outdir, exist_ok=True)
-    crawl_out = os.path.join(outdir, "crawl")
+# The pipeline modules (Playwright, lxml, the LLM client, ...) are imported inside the
+# functions that use them, so --help and argument errors return without loading them.
+
+
+# With --reuse_session the model stays loaded this long after a run, so the next run
+# within the window reuses the cached system-prompt prefix instead of re-reading it.
+REUSE_SESSION_KEEP_ALIVE = "30m"
+
+# How long validate_url waits on DNS before letting the crawl find out for itself.
+DNS_TIMEOUT = 2.0
+
+# Crawl results are cached under <outdir>/.cache for this long (seconds), keyed on the crawl arguments.
+CRAWL_CACHE_DIR = ".cache"
+CRAWL_CACHE_TTL = 24 * 3600
+
+# --urls_file runs up to this many sites at once by default, one process each.
+MAX_SITE_WORKERS = 8
+LOG_FORMAT = "%(asctime)s %(message)s"
+
+# Set in --urls_file worker processes: a semaphore shared by all of them that bounds
+# how many scaffold requests hit the LLM at the same time.
+_LLM_SLOTS = None
+
+# Mirrors gen_alpha.COMPRESSION_CHOICES; None leaves gen_alpha's default in place.
+COMPRESSION_CHOICES = ("none", "fast", "zstd")
+
+
+def _run(coro):
+    # Fresh loop per call, torn down deterministically (unlike get_event_loop().run_until_complete).
+    # uvloop is an optional libuv-based drop-in event loop (not available on Windows).
+    try:
+        import uvloop
+    except Exception:
+        import asyncio
+        return asyncio.run(coro)
+    return uvloop.run(coro)
+
+
+def validate_url(url, resolve=True, dns_timeout=DNS_TIMEOUT):
+    """
+    Cheap checks to run before any event loop or browser starts: an http(s) scheme,
+    a host, and (with resolve) that the host resolves. Returns an error message, or None.
+    """
+    try:
+        p = urlparse(url)
+        host, port = p.hostname, p.port
+    except ValueError as e:
+        return f"Invalid URL {url!r}: {e}"
+    if p.scheme not in ("http", "https") or not host:
+        return f"Not an http(s) URL: {url!r}"
+    if not resolve:
+        return None
+
+    failure = []
+
+    def lookup():
+        try:
+            socket.getaddrinfo(host, port)
+        except OSError as e:
+            failure.append(e)
+
+    # getaddrinfo has no timeout of its own; a daemon thread lets a stuck lookup be abandoned.
+    t = threading.Thread(target=lookup, daemon=True)
+    t.start()
+    t.join(dns_timeout)
+    if failure:
+        return f"Cannot resolve {host}: {failure[0]}"
+    return None
+
+
+def crawl_cache_stem(outdir, url, max_pages, max_depth):
+    key = hashlib.blake2b(f"{url}|{max_pages}|{max_depth}".encode("utf-8"), digest_size=16).hexdigest()
+    return f"{outdir}/{CRAWL_CACHE_DIR}/{key}"
+
+
+def loaded_page_count(crawl_res):
+    """Pages in crawl_res whose navigation succeeded (CrawlPage records or reloaded dicts)."""
+    return sum(1 for meta in crawl_res.values()
+               if (meta.get("loaded", True) if isinstance(meta, dict) else meta.loaded))
+
+
+def load_cached_crawl(stem, url, ttl=CRAWL_CACHE_TTL):
+    """
+    Cached crawl results for stem, or None if missing, older than ttl, without a loaded
+    page, or the start page's ETag has changed since (checked with a conditional HEAD).
+    """
+    from crawler import head_etag
+    from serialization import load_artifact, MSGPACK_SUFFIX
+
+    for path in (stem + MSGPACK_SUFFIX, stem + ".json"):
+        try:
+            if time.time() - os.path.getmtime(path) > ttl:
+                return None
+            entry = load_artifact(path)
+            pages = entry["pages"]
+            if not pages or not loaded_page_count(pages):
+                return None
+        except Exception:
+            continue
+        etag = entry.get("etag")
+        if etag:
+            status, current = head_etag(url, if_none_match=etag)
+            # 304 = unchanged; no answer (offline) keeps the cache usable.
+            if status is not None and status != 304 and current != etag:
+                return None
+        return pages
+    return None
+
+
+def store_cached_crawl(stem, etag, crawl_res):
+    from serialization import dump_artifact
+
+    os.makedirs(os.path.dirname(stem), exist_ok=True)
+    return dump_artifact({"etag": etag, "pages": crawl_res}, stem)
+
+
+def _holding(lock, fn, *args, **kwargs):
+    with lock:
+        return fn(*args, **kwargs)
+
+
+def _warm_if_idle(warm_model, keep_alive):
+    # In a --urls_file batch the warm-up counts against the LLM limit like any request. Only
+    # warm when a slot is free right now: a busy server already has the model loaded.
+    if _LLM_SLOTS is None:
+        return warm_model(keep_alive=keep_alive)
+    if not _LLM_SLOTS.acquire(block=False):
+        return False
+    try:
+        return warm_model(keep_alive=keep_alive)
+    finally:
+        _LLM_SLOTS.release()
+
+
+async def run_pipeline(url, outdir="run_output", max_pages=15, max_depth=2, app_name="GeneratedApp", write_index=False, keep_alive=None,
+                       compression=None, pretty=False, cache=True, refresh=False, pool=None):
+    """
+    Crawl url, extract its UX spec and generate the scaffold archive; returns the archive path.
+    With cache, a recent crawl of the same url/max_pages/max_depth is reused (refresh re-crawls and replaces it).
+    pool is a crawler.BrowserPool to crawl with, left open; without one the crawl launches and closes its own.
+    """
+    import asyncio
+    from crawler import crawl, head_etag
+    from extractor import extract_from_crawl_obj
+    from gen_alpha import generate_scaffold, warm_model
+    from serialization import dump_artifact, dump_file
+
+    # All per-run paths up front; makedirs on crawl_out creates outdir as well.
+    crawl_out = f"{outdir}/crawl"
+    index_stem = f"{crawl_out}/crawl_index"
+    spec_out = f"{outdir}/ux_spec.json"
     os.makedirs(crawl_out, exist_ok=True)
 
-    print("Starting crawl (headless)...")
-    loop = asyncio.get_event_loop()
+    # The LLM's system prompt doesn't depend on the crawl, so load the model and
+    # prefill it in the background; the scaffold request then starts warm.
+    warm_task = asyncio.create_task(asyncio.to_thread(_warm_if_idle, warm_model, keep_alive))
+
     try:
-        crawl_res = loop.run_until_complete(crawl(url, max_pages=max_pages, max_depth=max_depth, out_dir=crawl_out))
-    except Exception as e:
-        print("Crawl failed:", e)
-        sys.exit(1)
-    print("Crawl finished. Writing index...")
-    index_path = os.path.join(crawl_out, "crawl_index.json")
-    with open(index_path, "w", encoding="utf-8") as f:
-        json.dump(crawl_res, f, indent=2)
-
-    print("Extracting UX spec...")
-    
-    spec_out = os.path.join(outdir, "ux_spec.json")
-    from extractor import extract_from_crawl_index as extract_fn
-    ux_spec = extract_fn(index_path)
-    with open(spec_out, "w", encoding="utf-8") as f:
-        json.dump(ux_spec, f, indent=2)
-    print("UX spec written to", spec_out)
-
-    print("Generating scaffold via LLM...")
+        cache_stem = crawl_cache_stem(outdir, url, max_pages, max_depth) if cache else None
+        crawl_res = None
+        if cache_stem and not refresh:
+            crawl_res = await asyncio.to_thread(load_cached_crawl, cache_stem, url)
+
+        cache_entry = None
+        if crawl_res is not None:
+            log.info("Using cached crawl (%d pages); pass --refresh to re-crawl.", len(crawl_res))
+        else:
+            # The start page's ETag is recorded with the cache entry; fetch it while the crawl runs.
+            etag_task = asyncio.create_task(asyncio.to_thread(head_etag, url)) if cache_stem else None
+            log.info("Starting crawl (headless)...")
+            try:
+                crawl_res = await crawl(url, max_pages=max_pages, max_depth=max_depth, out_dir=crawl_out, pool=pool)
+            except Exception as e:
+                log.error("Crawl failed: %s", e)
+                sys.exit(1)
+            log.info("Crawl finished.")
+            if not crawl_res:
+                log.error("Crawl failed: no pages were crawled")
+                sys.exit(1)
+            if etag_task is not None:
+                etag_status, etag = await etag_task
+                # Only a crawl that loaded something, with an answer to validate it against later, is worth reusing.
+                if etag_status is not None and loaded_page_count(crawl_res):
+                    cache_entry = (cache_stem, etag)
+
+        log.info("Extracting UX spec...")
+        side_writes = []
+        if write_index:
+            # Debug artifact only.
+            side_writes.append(asyncio.to_thread(dump_artifact, crawl_res, index_stem))
+        # The index write only reads crawl_res, so it overlaps the extractor's CPU work instead of preceding it.
+        ux_spec, *written = await asyncio.gather(asyncio.to_thread(extract_from_crawl_obj, crawl_res), *side_writes)
+        for path in written:
+            log.info("Wrote %s", path)
+        if cache_entry is not None:
+            # Stored only now that extraction has succeeded on it.
+            log.info("Wrote %s", await asyncio.to_thread(store_cached_crawl, *cache_entry, crawl_res))
+        # Compact unless a human is going to read it; generate_scaffold doesn't care.
+        dump_file(ux_spec, spec_out, indent=pretty)
+        log.info("UX spec written to %s", spec_out)
+    finally:
+        # Wait out the warm-up even if this run bails early: a --urls_file batch shares one
+        # event loop, and a leftover warm-up would overlap the next site's LLM requests.
+        await warm_task
+
+    log.info("Generating scaffold via LLM...")
     try:
-        zip_path = generate_scaffold(ux_spec, app_name=app_name)
+        scaffold_kwargs = {"compression": compression} if compression else {}
+        zip_path = await asyncio.to_thread(_holding, _LLM_SLOTS or contextlib.nullcontext(), generate_scaffold,
+                                          ux_spec, app_name=app_name, keep_alive=keep_alive, **scaffold_kwargs)
     except Exception as e:
-        print("Scaffold generation failed:", e)
+        log.error("Scaffold generation failed: %s", e)
         sys.exit(1)
-    print("Done — scaffold zip:", zip_path)
+    log.info("Done — scaffold zip: %s", zip_path)
+    return zip_path
 
-if __name__ == "__main__":
+
+def _build_parser():
     parser = argparse.ArgumentParser()
-    parser.add_argument("url", help="URL of the app/site you own")
+    parser.add_argument("url", nargs="?", help="URL of the app/site you own")
+    parser.add_argument("--urls_file", default=None, help="Text file with one URL per line, run in one batch")
+    parser.add_argument("--max_workers", type=int, default=None,
+                        help=f"Sites run in parallel with --urls_file, one process each (default: CPU count, at most {MAX_SITE_WORKERS}; 1 = in this process)")
+    parser.add_argument("--llm_concurrency", type=int, default=1, help="Scaffold requests allowed in flight at once across --urls_file workers")
     parser.add_argument("--out", default="run_output")
     parser.add_argument("--max_pages", type=int, default=12)
     parser.add_argument("--max_depth", type=int, default=2)
     parser.add_argument("--name", default="GeneratedApp")
+    parser.add_argument("--write_index", action="store_true", help="Also save the raw crawl index (debugging)")
+    parser.add_argument("--reuse_session", action="store_true", help=f"Keep the LLM loaded for {REUSE_SESSION_KEEP_ALIVE} so re-runs hit its prompt cache")
+    parser.add_argument("--compression", choices=COMPRESSION_CHOICES, default=None,
+                        help="Scaffold archive: none/fast zip (default fast), or zstd (.tar.zst)")
+    parser.add_argument("--no_cache", action="store_true", help="Neither reuse nor store cached crawl results")
+    parser.add_argument("--refresh", action="store_true", help="Re-crawl even if a cached crawl exists, then update the cache")
+    parser.add_argument("--pretty", action="store_true", help="Indent ux_spec.json for reading (compact by default)")
+    parser.add_argument("--verbose", action="store_true", help="Log pipeline progress, not just warnings and errors")
+    return parser
+
+
+def read_urls_file(path):
+    """Non-empty, non-comment lines of path, in order."""
+    with open(path, "r", encoding="utf-8") as f:
+        return [line.strip() for line in f if line.strip() and not line.lstrip().startswith("#")]
+
+
+def _pipeline_kwargs(args):
+    return dict(max_pages=args.max_pages, max_depth=args.max_depth, write_index=args.write_index,
+                keep_alive=REUSE_SESSION_KEEP_ALIVE if args.reuse_session else None, compression=args.compression,
+                pretty=args.pretty, cache=not args.no_cache, refresh=args.refresh)
+
+
+def _url_problem(url, outdir, args):
+    # Offline re-runs can still use a cached crawl, so only insist on DNS when there is none.
+    stem = crawl_cache_stem(outdir, url, args.max_pages, args.max_depth)
+    cached = not (args.no_cache or args.refresh) and any(os.path.exists(stem + ext) for ext in (".msgpack", ".json"))
+    return validate_url(url, resolve=not cached)
+
+
+def _run_one(url, outdir, app_name, args):
+    problem = _url_problem(url, outdir, args)
+    if problem:
+        log.error("%s", problem)
+        sys.exit(2)
+    return _run(run_pipeline(url, outdir=outdir, app_name=app_name, **_pipeline_kwargs(args)))
+
+
+def _run_site(url, outdir, app_name, args):
+    """_run_one for batch runs: returns the archive path, or None if this site failed."""
+    try:
+        return _run_one(url, outdir, app_name, args)
+    except SystemExit:
+        # run_pipeline exits on a failed crawl/generation (already logged).
+        return None
+    except Exception:
+        log.exception("Pipeline failed for %s", url)
+        return None
+
+
+async def _run_sites_in_loop(jobs, args):
+    """
+    Sequential --urls_file batch: every site runs on this one event loop and crawls with
+    one shared BrowserPool, so Chromium is launched once for the batch, not once per site.
+    Returns the URLs that failed.
+    """
+    from crawler import BrowserPool
+
+    pool = BrowserPool()
+    failed = []
+    try:
+        for i, (url, outdir, app_name) in enumerate(jobs):
+            log.info("[%d/%d] %s", i + 1, len(jobs), url)
+            zip_path = None
+            problem = _url_problem(url, outdir, args)
+            if problem:
+                log.error("%s", problem)
+            else:
+                try:
+                    zip_path = await run_pipeline(url, outdir=outdir, app_name=app_name, pool=pool, **_pipeline_kwargs(args))
+                except SystemExit:
+                    # run_pipeline exits on a failed crawl/generation (already logged).
+                    pass
+                except Exception:
+                    log.exception("Pipeline failed for %s", url)
+            if zip_path:
+                print(zip_path)
+            else:
+                failed.append(url)
+    finally:
+        await pool.close()
+    return failed
+
+
+def _init_site_worker(llm_slots, log_level):
+    global _LLM_SLOTS
+    _LLM_SLOTS = llm_slots
+    logging.basicConfig(level=log_level, format=LOG_FORMAT)
+    # Workers share stdout with the parent; flush whole lines so their output doesn't interleave mid-line.
+    sys.stdout.reconfigure(line_buffering=True)
+    # Pay for the pipeline imports once per worker, before its first site.
+    import crawler, extractor, gen_alpha, serialization  # noqa: F401
+
+
+def run_urls_file(args):
+    """
+    Run the pipeline for every URL in args.urls_file. With more than one worker each site
+    runs in its own process, so one site's crawl overlaps another's parsing and LLM call.
+    Each site gets its own --out subfolder and app name, so no outputs collide.
+    """
+    urls = read_urls_file(args.urls_file)
+    jobs = []
+    for i, url in enumerate(urls):
+        try:
+            host = urlparse(url).netloc
+        except ValueError:
+            # Unparseable; validate_url reports it when the site runs.
+            host = ""
+        tag = f"{i:03d}_{host or 'site'}"
+        jobs.append((url, f"{args.out}/{tag}", f"{args.name}_{tag}"))
+    workers = min(args.max_workers or min(MAX_SITE_WORKERS, os.cpu_count() or 1), len(jobs))
+
+    failed = []
+    if workers <= 1:
+        failed = _run(_run_sites_in_loop(jobs, args))
+    else:
+        import multiprocessing
+        from concurrent.futures import ProcessPoolExecutor, as_completed
+
+        llm_slots = multiprocessing.BoundedSemaphore(max(1, args.llm_concurrency))
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_site_worker,
+                                 initargs=(llm_slots, logging.getLogger().level)) as ex:
+            futures = {ex.submit(_run_site, url, outdir, app_name, args): url for url, outdir, app_name in jobs}
+            for fut in as_completed(futures):
+                zip_path = fut.result()
+                if zip_path:
+                    print(zip_path)
+                else:
+                    failed.append(futures[fut])
+    if failed:
+        log.error("%d of %d URLs failed:\n  %s", len(failed), len(urls), "\n  ".join(failed))
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    parser = _build_parser()
     args = parser.parse_args()
-    run_pipeline(args.url, outdir=args.out, max_pages=args.max_pages, max_depth=args.max_depth, app_name=args.name)
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.WARNING, format=LOG_FORMAT)
+    if args.urls_file:
+        run_urls_file(args)
+    elif args.url:
+        print(_run_one(args.url, args.out, args.name, args))
+    else:
+        parser.error("a url or --urls_file is required")
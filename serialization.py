@@ -0,0 +1,99 @@
+# serialization.py
+# JSON helpers shared by the pipeline scripts. Uses orjson when it is installed
+# (much faster, emits UTF-8 bytes directly) and falls back to the stdlib json module.
+# Machine-only artifacts (e.g. the crawl index) go through msgspec's msgpack codec when available.
+import dataclasses
+import functools
+import json
+import os
+
+try:
+    import orjson
+    _ORJSON_AVAILABLE = True
+except Exception:
+    _ORJSON_AVAILABLE = False
+
+MSGPACK_SUFFIX = ".msgpack"
+
+
+@functools.lru_cache(maxsize=None)
+def _get_msgpack_codec():
+    """(encoder, decoder) from msgspec, imported on first use; None if msgspec isn't installed."""
+    try:
+        import msgspec
+    except Exception:
+        return None
+    return msgspec.msgpack.Encoder(), msgspec.msgpack.Decoder()
+
+
+def _json_default(obj):
+    # orjson and msgspec encode dataclass records (e.g. crawler.CrawlPage) natively; stdlib json needs help.
+    if dataclasses.is_dataclass(obj) and not isinstance(obj, type):
+        return dataclasses.asdict(obj)
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def dumps_bytes(obj, indent=True):
+    """Serialize obj to UTF-8 JSON bytes, 2-space indented unless indent=False."""
+    if _ORJSON_AVAILABLE:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2 if indent else 0)
+    if indent:
+        return json.dumps(obj, indent=2, default=_json_default).encode("utf-8")
+    return json.dumps(obj, separators=(",", ":"), default=_json_default).encode("utf-8")
+
+
+def dumps(obj, indent=True):
+    """Serialize obj to a JSON str, 2-space indented unless indent=False."""
+    return dumps_bytes(obj, indent=indent).decode("utf-8")
+
+
+def loads(data):
+    """Parse JSON from str or bytes."""
+    if _ORJSON_AVAILABLE:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def write_bytes(path, data):
+    # The encoders already produce the final bytes, so skip open()'s buffered writer
+    # and hand them to the kernel directly (normally a single write syscall).
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC | getattr(os, "O_BINARY", 0), 0o644)
+    try:
+        with memoryview(data) as view:
+            written = 0
+            while written < len(view):
+                written += os.write(fd, view[written:])
+    finally:
+        os.close(fd)
+
+
+def dump_file(obj, path, indent=True):
+    write_bytes(path, dumps_bytes(obj, indent=indent))
+
+
+def load_file(path):
+    with open(path, "rb") as f:
+        return loads(f.read())
+
+
+def dump_artifact(obj, stem):
+    """
+    Write an internal artifact that no human reads. Uses msgpack (stem + ".msgpack")
+    when msgspec is installed, else indented JSON (stem + ".json"). Returns the path written.
+    """
+    codec = _get_msgpack_codec()
+    if codec is not None:
+        path = stem + MSGPACK_SUFFIX
+        write_bytes(path, codec[0].encode(obj))
+        return path
+    path = stem + ".json"
+    dump_file(obj, path)
+    return path
+
+
+def load_artifact(path):
+    """Load a file written by dump_artifact (or any JSON file), picking the codec by suffix."""
+    if path.endswith(MSGPACK_SUFFIX):
+        with open(path, "rb") as f:
+            return _get_msgpack_codec()[1].decode(f.read())
+    return load_file(path)
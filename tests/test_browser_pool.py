@@ -0,0 +1,76 @@
+import asyncio
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import crawler
+from crawler import BrowserPool
+
+
+class _Context:
+    def __init__(self, browser):
+        self.browser = browser
+
+    async def close(self):
+        pass
+
+
+class _Browser:
+    def __init__(self):
+        self.closed = False
+
+    async def new_context(self):
+        return _Context(self)
+
+    async def close(self):
+        self.closed = True
+
+
+class _Chromium:
+    def __init__(self):
+        self.launched = []
+
+    async def launch(self, headless=True):
+        browser = _Browser()
+        self.launched.append(browser)
+        return browser
+
+
+class _Playwright:
+    def __init__(self):
+        self.chromium = _Chromium()
+
+    async def stop(self):
+        pass
+
+
+class _Starter:
+    def __init__(self, playwright):
+        self.playwright = playwright
+
+    async def start(self):
+        return self.playwright
+
+
+def test_recycling_wakes_waiting_caller(monkeypatch):
+    playwright = _Playwright()
+    monkeypatch.setattr(crawler, "async_playwright", lambda: _Starter(playwright))
+
+    async def use(pool, seen):
+        async with pool.acquire_context() as context:
+            seen.append(context.browser)
+            await asyncio.sleep(0)
+
+    async def main():
+        pool = BrowserPool(size=1, recycle_after=1)
+        seen = []
+        await asyncio.wait_for(asyncio.gather(use(pool, seen), use(pool, seen)), timeout=5)
+        await pool.close()
+        return seen
+
+    seen = asyncio.run(main())
+    assert len(seen) == 2
+    assert seen[0] is not seen[1]
+    assert len(playwright.chromium.launched) == 2
+    assert all(b.closed for b in playwright.chromium.launched)
@@ -0,0 +1,25 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import extractor
+from extractor import extract_components_from_tree, parse_lexbor, parse_lxml
+
+VALUELESS_ATTRS_HTML = """<html><head><title>Valueless</title></head><body>
+<nav><a href>Home</a><a href="/about">About</a><a>Not a link</a></nav>
+<img src><img src="/logo.png">
+<form action><input name="q" required><input type="password" placeholder></form>
+<button class>Go</button>
+</body></html>"""
+
+
+@pytest.mark.skipif(not extractor._SELECTOLAX_AVAILABLE, reason="selectolax not installed")
+def test_lexbor_matches_lxml_on_valueless_attributes():
+    from_lxml = extract_components_from_tree(parse_lxml(VALUELESS_ATTRS_HTML), url="http://example.test/")
+    from_lexbor = extract_components_from_tree(parse_lexbor(VALUELESS_ATTRS_HTML), url="http://example.test/")
+    assert from_lexbor == from_lxml
+    nav = next(c for c in from_lxml["components"] if c["type"] == "nav")
+    assert nav["links"] == ["Home", "About"]